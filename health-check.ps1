@@ -1,57 +1,50 @@
 # PowerShell System Health Check for Windows
 
+. (Join-Path $PSScriptRoot "service-helpers.ps1")
+
 Write-Host "🔍 Airguard System Health Check" -ForegroundColor Cyan
 Write-Host "================================" -ForegroundColor Cyan
 Write-Host ""
 
+$ports = @(
+    @{Port=8080; Name="Node Backend HTTP"},
+    @{Port=8081; Name="WebSocket"},
+    @{Port=1883; Name="MQTT"},
+    @{Port=27017; Name="MongoDB"}
+)
+
+# Probe every port once, all started up front, so each section reports the same verdict
+$probes = foreach ($p in $ports) { Start-LocalPortProbe $p.Port }
+$portOpen = @{}
+foreach ($probe in $probes) {
+    $portOpen[$probe.Port] = Complete-LocalPortProbe $probe
+}
+
 # Check MongoDB
 Write-Host "📊 MongoDB Status:" -ForegroundColor Yellow
-try {
-    $null = Test-NetConnection -ComputerName localhost -Port 27017 -InformationLevel Quiet -WarningAction SilentlyContinue
-    if ($?) {
-        Write-Host "  ✓ MongoDB port 27017 is open" -ForegroundColor Green
-    } else {
-        Write-Host "  ✗ MongoDB port 27017 is closed" -ForegroundColor Red
-    }
-} catch {
-    Write-Host "  ⚠ Could not check MongoDB" -ForegroundColor Yellow
+if ($portOpen[27017]) {
+    Write-Host "  ✓ MongoDB port 27017 is open" -ForegroundColor Green
+} else {
+    Write-Host "  ✗ MongoDB port 27017 is closed" -ForegroundColor Red
 }
 Write-Host ""
 
 # Check MQTT Broker
 Write-Host "🔌 MQTT Broker Status:" -ForegroundColor Yellow
-try {
-    $null = Test-NetConnection -ComputerName localhost -Port 1883 -InformationLevel Quiet -WarningAction SilentlyContinue
-    if ($?) {
-        Write-Host "  ✓ MQTT port 1883 is open" -ForegroundColor Green
-    } else {
-        Write-Host "  ✗ MQTT port 1883 is closed" -ForegroundColor Red
-    }
-} catch {
-    Write-Host "  ⚠ Could not check MQTT" -ForegroundColor Yellow
+if ($portOpen[1883]) {
+    Write-Host "  ✓ MQTT port 1883 is open" -ForegroundColor Green
+} else {
+    Write-Host "  ✗ MQTT port 1883 is closed" -ForegroundColor Red
 }
 Write-Host ""
 
 # Check ports
 Write-Host "🌐 Port Status:" -ForegroundColor Yellow
-
-$ports = @(
-    @{Port=8080; Name="Node Backend HTTP"},
-    @{Port=8081; Name="WebSocket"},
-    @{Port=1883; Name="MQTT"},
-    @{Port=27017; Name="MongoDB"}
-)
-
 foreach ($p in $ports) {
-    try {
-        $result = Test-NetConnection -ComputerName localhost -Port $p.Port -InformationLevel Quiet -WarningAction SilentlyContinue
-        if ($result) {
-            Write-Host "  ✓ Port $($p.Port) ($($p.Name)) is open" -ForegroundColor Green
-        } else {
-            Write-Host "  ✗ Port $($p.Port) ($($p.Name)) is closed" -ForegroundColor Red
-        }
-    } catch {
-        Write-Host "  ⚠ Could not check port $($p.Port)" -ForegroundColor Yellow
+    if ($portOpen[$p.Port]) {
+        Write-Host "  ✓ Port $($p.Port) ($($p.Name)) is open" -ForegroundColor Green
+    } else {
+        Write-Host "  ✗ Port $($p.Port) ($($p.Name)) is closed" -ForegroundColor Red
     }
 }
 Write-Host ""
@@ -9,15 +9,36 @@ import json
 import time
 import sqlite3
 import logging
-import re
+import operator
+import queue
+import signal
+import threading
 from datetime import datetime, timezone
 from typing import Optional, Dict, Any
 
 import serial
 import paho.mqtt.client as mqtt
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from dotenv import load_dotenv
 
+try:
+    import orjson
+    _loads = orjson.loads
+    _dumps = orjson.dumps
+except ImportError:
+    _loads = json.loads
+
+    def _dumps(obj) -> bytes:
+        return json.dumps(obj).encode('utf-8')
+
+try:
+    # Drop-in float()/int() replacements that raise ValueError like the builtins
+    from fastnumbers import float as _ff, int as _fi
+except ImportError:
+    _ff, _fi = float, int
+
 # Load environment
 load_dotenv()
 
@@ -34,6 +55,14 @@ MQTT_USERNAME = os.getenv('MQTT_USERNAME', '')
 MQTT_PASSWORD = os.getenv('MQTT_PASSWORD', '')
 MQTT_QOS = int(os.getenv('MQTT_QOS', '1'))
 LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+JSON_ONLY = os.getenv('JSON_ONLY', '0') == '1'
+DEBUG_ECHO = os.getenv('DEBUG_ECHO', '0') == '1'
+SQLITE_BATCH_SIZE = int(os.getenv('SQLITE_BATCH_SIZE', '64'))
+SQLITE_FLUSH_INTERVAL = float(os.getenv('SQLITE_FLUSH_INTERVAL', '0.5'))
+RX_BUFFER_LIMIT = 65536
+OUTBOUND_QUEUE_SIZE = int(os.getenv('OUTBOUND_QUEUE_SIZE', '1024'))
+CLOUD_WORKERS = max(1, int(os.getenv('CLOUD_WORKERS', '4')))
+WORKER_SHUTDOWN_TIMEOUT = 10.0
 
 # Setup logging
 logging.basicConfig(
@@ -42,6 +71,161 @@ logging.basicConfig(
 )
 logger = logging.getLogger('airguard-gateway')
 
+# Raw echo writer, bound only when echoing and stdout has a byte buffer
+# (sys.stdout is None under pythonw and some service wrappers)
+_stdout_write = None
+if DEBUG_ECHO and getattr(sys.stdout, 'buffer', None) is not None:
+    _stdout_write = sys.stdout.buffer.write
+
+# Upsert in place on a repeated batch id (keeps id and created_at)
+_INSERT_SQL = '''
+    INSERT INTO samples (
+        batch_id, session_ms, samples, date_ymd, time_hms, msec,
+        lat, lon, alt, gps_fix, sats,
+        ax, ay, az, gx, gy, gz, temp_c, received_ts
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(batch_id) DO UPDATE SET
+        session_ms = excluded.session_ms,
+        samples = excluded.samples,
+        date_ymd = excluded.date_ymd,
+        time_hms = excluded.time_hms,
+        msec = excluded.msec,
+        lat = excluded.lat,
+        lon = excluded.lon,
+        alt = excluded.alt,
+        gps_fix = excluded.gps_fix,
+        sats = excluded.sats,
+        ax = excluded.ax,
+        ay = excluded.ay,
+        az = excluded.az,
+        gx = excluded.gx,
+        gy = excluded.gy,
+        gz = excluded.gz,
+        temp_c = excluded.temp_c,
+        received_ts = excluded.received_ts,
+        updated_at = CURRENT_TIMESTAMP
+'''
+
+# Packet keys in _INSERT_SQL column order, with the default for missing values
+_SAMPLE_FIELDS = (
+    ('batchId', None),
+    ('sessionMs', None),
+    ('samples', None),
+    ('dateYMD', 0),
+    ('timeHMS', 0),
+    ('msec', 0),
+    ('lat', 0.0),
+    ('lon', 0.0),
+    ('alt', 0.0),
+    ('gpsFix', 0),
+    ('sats', 0),
+    ('ax', 0.0),
+    ('ay', 0.0),
+    ('az', 0.0),
+    ('gx', 0.0),
+    ('gy', 0.0),
+    ('gz', 0.0),
+    ('tempC', 0.0),
+    ('receivedTs', None),
+)
+_SAMPLE_DEFAULTS = dict(_SAMPLE_FIELDS)
+_sample_row = operator.itemgetter(*(key for key, _ in _SAMPLE_FIELDS))
+
+# Last (epoch ms, ISO string) pair returned by _now_iso_ms
+_iso_cache = [0, '']
+
+
+def _now_iso_ms() -> str:
+    """UTC ISO-8601 timestamp at millisecond resolution, rebuilt at most once per ms"""
+    ms = time.time_ns() // 1_000_000
+    if ms != _iso_cache[0]:
+        _iso_cache[0] = ms
+        _iso_cache[1] = datetime.fromtimestamp(ms / 1000, tz=timezone.utc).isoformat(timespec='milliseconds')
+    return _iso_cache[1]
+
+
+def _line_fields(line: str) -> Dict[str, str]:
+    """
+    Tokenize a fenced block line into {key: value}, where each value is the
+    token following a 'key:' token, e.g. 'Lat: 33.88  Lon: 35.49' ->
+    {'Lat': '33.88', 'Lon': '35.49'}
+    """
+    tokens = line.replace('|', ' ').replace(',', ' ').split()
+    return {tok[:-1]: tokens[i + 1] for i, tok in enumerate(tokens[:-1]) if tok.endswith(':')}
+
+
+def _parse_batch(line: str, data: Dict[str, Any]):
+    """Line 1: Batch | Duration | Samples"""
+    f = _line_fields(line)
+    if f.get('Batch', '').startswith('0x'):
+        data['batchId'] = f['Batch'][2:].upper()
+    if 'Duration' in f:
+        data['sessionMs'] = _fi(f['Duration'])
+    if 'Samples' in f:
+        data['samples'] = _fi(f['Samples'])
+
+
+def _parse_gps(line: str, data: Dict[str, Any]):
+    """Line 2: GPS Fix, Sats, Date, Time"""
+    f = _line_fields(line)
+    if 'Fix' in f:
+        data['gpsFix'] = _fi(f['Fix'])
+    if 'Sats' in f:
+        data['sats'] = _fi(f['Sats'])
+    if 'Date' in f:
+        data['dateYMD'] = _fi(f['Date'])
+    if 'Time' in f:
+        hms, _, msec = f['Time'].partition('.')
+        data['timeHMS'] = _fi(hms)
+        data['msec'] = _fi(msec or 0)
+
+
+def _parse_latlon(line: str, data: Dict[str, Any]):
+    """Line 3: Lat, Lon, Alt"""
+    f = _line_fields(line)
+    if 'Lat' in f:
+        data['lat'] = _ff(f['Lat'])
+    if 'Lon' in f:
+        data['lon'] = _ff(f['Lon'])
+    if 'Alt' in f:
+        data['alt'] = _ff(f['Alt'])
+
+
+def _parse_accel(line: str, data: Dict[str, Any]):
+    """Line 4: Accel"""
+    f = _line_fields(line)
+    if 'X' in f and 'Y' in f and 'Z' in f:
+        data['ax'] = _ff(f['X'])
+        data['ay'] = _ff(f['Y'])
+        data['az'] = _ff(f['Z'])
+
+
+def _parse_gyro(line: str, data: Dict[str, Any]):
+    """Line 5: Gyro"""
+    f = _line_fields(line)
+    if 'X' in f and 'Y' in f and 'Z' in f:
+        data['gx'] = _ff(f['X'])
+        data['gy'] = _ff(f['Y'])
+        data['gz'] = _ff(f['Z'])
+
+
+def _parse_temp(line: str, data: Dict[str, Any]):
+    """Line 6: Temp"""
+    f = _line_fields(line)
+    if 'Temp' in f:
+        data['tempC'] = _ff(f['Temp'])
+
+
+# Fenced block handlers keyed on the first token of each line
+_LINE_HANDLERS = {
+    'Batch:': _parse_batch,
+    'GPS': _parse_gps,
+    'Lat:': _parse_latlon,
+    'Accel': _parse_accel,
+    'Gyro': _parse_gyro,
+    'Temp:': _parse_temp,
+}
+
 
 class AirguardGateway:
     """Main gateway class handling serial parsing and data forwarding"""
@@ -49,14 +233,73 @@ class AirguardGateway:
     def __init__(self):
         self.db_conn = None
         self.mqtt_client = None
+        self.http_session = None
         self.serial_port = None
+        self._insert_cursor = None
+        self._pending = []
+        self._last_flush = time.monotonic()
+        self._cloud_q = queue.Queue(maxsize=OUTBOUND_QUEUE_SIZE)
+        self._mqtt_q = queue.Queue(maxsize=OUTBOUND_QUEUE_SIZE)
+        self._workers = []
+        self._rx_buf = bytearray()
+        self._in_packet = False
+        self._packet_lines = []
         self.setup_database()
         self.setup_mqtt()
+        self.setup_http()
+        self.start_workers()
         
+    def start_workers(self):
+        """Start background threads that drain the cloud and MQTT queues (configured targets only)"""
+        targets = []
+        if self.http_session:
+            # Several cloud workers keep POSTs overlapping on the session's connection pool
+            targets += [(f'cloud-worker-{i}', self._cloud_q, self.post_to_cloud) for i in range(CLOUD_WORKERS)]
+        if self.mqtt_client:
+            targets.append(('mqtt-worker', self._mqtt_q, self.publish_to_mqtt))
+        
+        for name, q, handler in targets:
+            worker = threading.Thread(target=self._drain_queue, args=(q, handler), name=name, daemon=True)
+            worker.start()
+            self._workers.append((q, worker))
+    
+    def _drain_queue(self, q: queue.Queue, handler):
+        """Worker loop: hand each queued packet to handler until a None sentinel arrives"""
+        while True:
+            data = q.get()
+            if data is None:
+                break
+            handler(data)
+    
+    def _discard_queue(self, q: queue.Queue) -> int:
+        """Empty q and return how many packets (not sentinels) were still in it"""
+        count = 0
+        while True:
+            try:
+                if q.get_nowait() is not None:
+                    count += 1
+            except queue.Empty:
+                return count
+    
+    def _enqueue(self, q: queue.Queue, data: Dict[str, Any], target: str):
+        """Queue packet for a worker, dropping it if the worker has fallen behind"""
+        try:
+            q.put_nowait(data)
+        except queue.Full:
+            logger.warning(f"{target} queue full, dropping packet {data['batchId']}")
+    
     def setup_database(self):
         """Initialize SQLite database with schema"""
         try:
-            self.db_conn = sqlite3.connect(SQLITE_DB)
+            self.db_conn = sqlite3.connect(
+                SQLITE_DB,
+                isolation_level=None,
+                cached_statements=256,
+                check_same_thread=False
+            )
+            self.db_conn.execute('PRAGMA journal_mode=WAL')
+            self.db_conn.execute('PRAGMA synchronous=NORMAL')
+            self.db_conn.execute('PRAGMA temp_store=MEMORY')
             cursor = self.db_conn.cursor()
             cursor.execute('''
                 CREATE TABLE IF NOT EXISTS samples (
@@ -84,9 +327,8 @@ class AirguardGateway:
                     updated_at TEXT DEFAULT CURRENT_TIMESTAMP
                 )
             ''')
-            cursor.execute('CREATE INDEX IF NOT EXISTS idx_batch_id ON samples(batch_id)')
             cursor.execute('CREATE INDEX IF NOT EXISTS idx_received_ts ON samples(received_ts)')
-            self.db_conn.commit()
+            self._insert_cursor = self.db_conn.cursor()
             logger.info(f"SQLite database initialized: {SQLITE_DB}")
         except Exception as e:
             logger.error(f"Database setup failed: {e}")
@@ -114,6 +356,27 @@ class AirguardGateway:
             logger.error(f"MQTT setup failed: {e}")
             self.mqtt_client = None
     
+    def setup_http(self):
+        """Create a pooled keep-alive HTTP session for cloud POSTs if configured"""
+        if not CLOUD_POST_URL:
+            return
+        
+        self.http_session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=4,
+            pool_maxsize=16,
+            max_retries=Retry(
+                total=2,
+                backoff_factor=0.1,
+                status_forcelist=(502, 503, 504),
+                allowed_methods=frozenset(['POST'])
+            )
+        )
+        self.http_session.mount('http://', adapter)
+        self.http_session.mount('https://', adapter)
+        if CLOUD_AUTH_TOKEN:
+            self.http_session.headers['Authorization'] = f'Bearer {CLOUD_AUTH_TOKEN}'
+    
     def _on_mqtt_connect(self, client, userdata, flags, rc):
         if rc == 0:
             logger.info("MQTT connected successfully")
@@ -129,13 +392,16 @@ class AirguardGateway:
             if line.startswith('JSON:'):
                 line = line[5:].strip()
             
-            data = json.loads(line)
+            data = _loads(line)
             
             # Convert hex batchId to string without 0x prefix
-            if 'batchId' in data and isinstance(data['batchId'], str):
-                data['batchId'] = data['batchId'].replace('0x', '').replace('0X', '').upper()
+            bid = data.get('batchId')
+            if isinstance(bid, str):
+                if bid[:2] in ('0x', '0X'):
+                    bid = bid[2:]
+                data['batchId'] = bid.upper()
             
-            data['receivedTs'] = datetime.now(timezone.utc).isoformat()
+            data['receivedTs'] = _now_iso_ms()
             return data
             
         except json.JSONDecodeError:
@@ -153,73 +419,14 @@ class AirguardGateway:
             
             for line in lines:
                 line = line.strip()
-                
-                # Line 1: Batch | Duration | Samples
-                if 'Batch:' in line:
-                    m = re.search(r'Batch:\s*0x([0-9A-Fa-f]+)', line)
-                    if m:
-                        data['batchId'] = m.group(1).upper()
-                    m = re.search(r'Duration:\s*(\d+)', line)
-                    if m:
-                        data['sessionMs'] = int(m.group(1))
-                    m = re.search(r'Samples:\s*(\d+)', line)
-                    if m:
-                        data['samples'] = int(m.group(1))
-                
-                # Line 2: GPS Fix, Sats, Date, Time
-                elif 'GPS Fix:' in line:
-                    m = re.search(r'GPS Fix:\s*(\d+)', line)
-                    if m:
-                        data['gpsFix'] = int(m.group(1))
-                    m = re.search(r'Sats:\s*(\d+)', line)
-                    if m:
-                        data['sats'] = int(m.group(1))
-                    m = re.search(r'Date:\s*(\d+)', line)
-                    if m:
-                        data['dateYMD'] = int(m.group(1))
-                    m = re.search(r'Time:\s*(\d+)\.(\d+)', line)
-                    if m:
-                        data['timeHMS'] = int(m.group(1))
-                        data['msec'] = int(m.group(2))
-                
-                # Line 3: Lat, Lon, Alt
-                elif 'Lat:' in line:
-                    m = re.search(r'Lat:\s*([-\d.]+)', line)
-                    if m:
-                        data['lat'] = float(m.group(1))
-                    m = re.search(r'Lon:\s*([-\d.]+)', line)
-                    if m:
-                        data['lon'] = float(m.group(1))
-                    m = re.search(r'Alt:\s*([-\d.]+)', line)
-                    if m:
-                        data['alt'] = float(m.group(1))
-                
-                # Line 4: Accel
-                elif 'Accel' in line:
-                    m = re.search(r'X:\s*([-\d.]+)\s+Y:\s*([-\d.]+)\s+Z:\s*([-\d.]+)', line)
-                    if m:
-                        data['ax'] = float(m.group(1))
-                        data['ay'] = float(m.group(2))
-                        data['az'] = float(m.group(3))
-                
-                # Line 5: Gyro
-                elif 'Gyro' in line:
-                    m = re.search(r'X:\s*([-\d.]+)\s+Y:\s*([-\d.]+)\s+Z:\s*([-\d.]+)', line)
-                    if m:
-                        data['gx'] = float(m.group(1))
-                        data['gy'] = float(m.group(2))
-                        data['gz'] = float(m.group(3))
-                
-                # Line 6: Temp
-                elif 'Temp:' in line:
-                    m = re.search(r'Temp:\s*([-\d.]+)', line)
-                    if m:
-                        data['tempC'] = float(m.group(1))
+                handler = _LINE_HANDLERS.get(line.partition(' ')[0])
+                if handler:
+                    handler(line, data)
             
             # Validate required fields
             required = ['batchId', 'sessionMs', 'samples']
             if all(k in data for k in required):
-                data['receivedTs'] = datetime.now(timezone.utc).isoformat()
+                data['receivedTs'] = _now_iso_ms()
                 return data
             else:
                 logger.warning(f"Incomplete packet data: {data}")
@@ -230,42 +437,48 @@ class AirguardGateway:
             return None
     
     def store_to_sqlite(self, data: Dict[str, Any]) -> bool:
-        """Store parsed packet to SQLite"""
+        """Queue parsed packet for the next batched SQLite write"""
+        self._pending.append(_sample_row({**_SAMPLE_DEFAULTS, **data}))
+        return self.flush_sqlite_if_due()
+    
+    def flush_sqlite_if_due(self) -> bool:
+        """Flush queued rows once the batch is full or the flush interval has elapsed"""
+        if (len(self._pending) >= SQLITE_BATCH_SIZE
+                or time.monotonic() - self._last_flush > SQLITE_FLUSH_INTERVAL):
+            return self.flush_sqlite()
+        return True
+    
+    def flush_sqlite(self) -> bool:
+        """Write all queued rows to SQLite in a single transaction"""
+        self._last_flush = time.monotonic()
+        if not self._pending:
+            return True
+        
         try:
-            cursor = self.db_conn.cursor()
-            cursor.execute('''
-                INSERT OR REPLACE INTO samples (
-                    batch_id, session_ms, samples, date_ymd, time_hms, msec,
-                    lat, lon, alt, gps_fix, sats,
-                    ax, ay, az, gx, gy, gz, temp_c, received_ts
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                data.get('batchId'),
-                data.get('sessionMs'),
-                data.get('samples'),
-                data.get('dateYMD', 0),
-                data.get('timeHMS', 0),
-                data.get('msec', 0),
-                data.get('lat', 0.0),
-                data.get('lon', 0.0),
-                data.get('alt', 0.0),
-                data.get('gpsFix', 0),
-                data.get('sats', 0),
-                data.get('ax', 0.0),
-                data.get('ay', 0.0),
-                data.get('az', 0.0),
-                data.get('gx', 0.0),
-                data.get('gy', 0.0),
-                data.get('gz', 0.0),
-                data.get('tempC', 0.0),
-                data.get('receivedTs')
-            ))
-            self.db_conn.commit()
-            logger.info(f"SQLite stored: {data['batchId']}")
+            self._insert_cursor.execute('BEGIN')
+            self._insert_cursor.executemany(_INSERT_SQL, self._pending)
+            self._insert_cursor.execute('COMMIT')
+            logger.info(f"SQLite stored {len(self._pending)} packet(s)")
             return True
         except Exception as e:
-            logger.error(f"SQLite insert failed: {e}")
-            return False
+            if self.db_conn.in_transaction:
+                self.db_conn.rollback()
+            logger.warning(f"SQLite batch insert failed ({e}), retrying row by row")
+            return self._store_rows_individually()
+        finally:
+            self._pending.clear()
+    
+    def _store_rows_individually(self) -> bool:
+        """Insert queued rows one at a time, dropping only the rows that fail"""
+        stored = 0
+        for row in self._pending:
+            try:
+                self._insert_cursor.execute(_INSERT_SQL, row)
+                stored += 1
+            except Exception as e:
+                logger.error(f"SQLite insert failed for batch {row[0]}: {e}")
+        logger.info(f"SQLite stored {stored} of {len(self._pending)} packet(s)")
+        return stored == len(self._pending)
     
     def post_to_cloud(self, data: Dict[str, Any]) -> bool:
         """POST packet to cloud REST API"""
@@ -273,15 +486,10 @@ class AirguardGateway:
             return True  # No-op if not configured
         
         try:
-            headers = {'Content-Type': 'application/json'}
-            if CLOUD_AUTH_TOKEN:
-                headers['Authorization'] = f'Bearer {CLOUD_AUTH_TOKEN}'
-            
-            response = requests.post(
+            response = self.http_session.post(
                 CLOUD_POST_URL,
                 json=data,
-                headers=headers,
-                timeout=5
+                timeout=(1, 5)
             )
             
             if response.status_code in (200, 201):
@@ -301,7 +509,7 @@ class AirguardGateway:
             return True  # No-op if not configured
         
         try:
-            payload = json.dumps(data)
+            payload = _dumps(data)
             result = self.mqtt_client.publish(MQTT_TOPIC, payload, qos=MQTT_QOS)
             
             if result.rc == mqtt.MQTT_ERR_SUCCESS:
@@ -322,11 +530,44 @@ class AirguardGateway:
         # Store locally
         self.store_to_sqlite(data)
         
-        # Forward to cloud
-        self.post_to_cloud(data)
+        # Forward to cloud and MQTT from the worker threads
+        if self.http_session:
+            self._enqueue(self._cloud_q, data, 'Cloud')
+        if self.mqtt_client:
+            self._enqueue(self._mqtt_q, data, 'MQTT')
+    
+    def handle_line(self, raw_line: bytes):
+        """Dispatch one serial line (raw bytes, without line ending)"""
+        # Echo raw bytes to console (buffered, no per-line flush)
+        if _stdout_write:
+            _stdout_write(raw_line)
+            _stdout_write(b'\n')
+        
+        # Try JSON first (fast path)
+        if raw_line[:1] == b'{' or raw_line[:5] == b'JSON:':
+            data = self.parse_json_line(raw_line.decode('utf-8', errors='ignore'))
+            if data:
+                self.process_packet(data)
+                return
         
-        # Publish to MQTT
-        self.publish_to_mqtt(data)
+        if JSON_ONLY:
+            return
+        
+        line = raw_line.decode('utf-8', errors='ignore')
+        
+        # Fall back to fenced block parsing
+        if line == "=== Received Data ===":
+            self._in_packet = True
+            self._packet_lines = [line]
+        elif self._in_packet:
+            self._packet_lines.append(line)
+            if line == "====================":
+                # Complete packet received
+                self._in_packet = False
+                data = self.parse_packet(self._packet_lines)
+                if data:
+                    self.process_packet(data)
+                self._packet_lines = []
     
     def run(self):
         """Main loop: read serial and process packets"""
@@ -337,43 +578,37 @@ class AirguardGateway:
             logger.error(f"Failed to open serial port {SERIAL_PORT}: {e}")
             sys.exit(1)
         
-        buffer = []
-        in_packet = False
-        
         logger.info("Gateway running. Waiting for packets...")
-        logger.info("Supports both JSON and fenced block formats")
+        if JSON_ONLY:
+            logger.info("JSON_ONLY set, fenced block parsing disabled")
+        else:
+            logger.info("Supports both JSON and fenced block formats")
         
         try:
             while True:
                 try:
-                    line = self.serial_port.readline().decode('utf-8', errors='ignore').strip()
+                    # Read whatever has arrived (at least one byte, or time out)
+                    chunk = self.serial_port.read(self.serial_port.in_waiting or 1)
                     
-                    if not line:
+                    if not chunk:
+                        self.flush_sqlite_if_due()
                         continue
                     
-                    # Echo to console
-                    print(line)
+                    self._rx_buf.extend(chunk)
+                    if b'\n' not in chunk:
+                        if len(self._rx_buf) > RX_BUFFER_LIMIT:
+                            logger.warning(f"Discarding {len(self._rx_buf)} bytes without a line ending")
+                            self._rx_buf.clear()
+                        continue
                     
-                    # Try JSON first (fast path)
-                    if line.startswith('JSON:') or line.startswith('{'):
-                        data = self.parse_json_line(line)
-                        if data:
-                            self.process_packet(data)
-                            continue
+                    # Keep the trailing partial line for the next read
+                    *lines, tail = self._rx_buf.split(b'\n')
+                    self._rx_buf = tail
                     
-                    # Fall back to fenced block parsing
-                    if line == "=== Received Data ===":
-                        in_packet = True
-                        buffer = [line]
-                    elif in_packet:
-                        buffer.append(line)
-                        if line == "====================":
-                            # Complete packet received
-                            in_packet = False
-                            data = self.parse_packet(buffer)
-                            if data:
-                                self.process_packet(data)
-                            buffer = []
+                    for raw_line in lines:
+                        raw_line = raw_line.rstrip(b'\r')
+                        if raw_line:
+                            self.handle_line(raw_line)
                     
                 except serial.SerialException as e:
                     logger.error(f"Serial error: {e}")
@@ -388,20 +623,52 @@ class AirguardGateway:
         """Clean shutdown"""
         logger.info("Cleaning up...")
         
+        if _stdout_write:
+            sys.stdout.flush()
+        
         if self.serial_port and self.serial_port.is_open:
             self.serial_port.close()
         
+        # Let the workers finish what is already queued, all within one deadline
+        deadline = time.monotonic() + WORKER_SHUTDOWN_TIMEOUT
+        for q, _ in self._workers:
+            try:
+                q.put(None, timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Full:
+                pass
+        for _, worker in self._workers:
+            worker.join(timeout=max(0.0, deadline - time.monotonic()))
+        for q, target in ((self._cloud_q, 'Cloud'), (self._mqtt_q, 'MQTT')):
+            undelivered = self._discard_queue(q)
+            if undelivered:
+                logger.warning(f"{target} shutdown timed out, {undelivered} packet(s) not delivered")
+        
         if self.mqtt_client:
             self.mqtt_client.loop_stop()
             self.mqtt_client.disconnect()
         
+        if self.http_session:
+            self.http_session.close()
+        
         if self.db_conn:
+            self.flush_sqlite()
             self.db_conn.close()
         
         logger.info("Gateway stopped")
 
 
+def _raise_keyboard_interrupt(signum, frame):
+    """Turn a termination signal into the Ctrl+C path so cleanup() flushes queued rows"""
+    logger.info(f"Received signal {signum}")
+    raise KeyboardInterrupt
+
+
 def main():
+    # systemd stops services with SIGTERM; Ctrl+Break raises SIGBREAK on Windows
+    signal.signal(signal.SIGTERM, _raise_keyboard_interrupt)
+    if hasattr(signal, 'SIGBREAK'):
+        signal.signal(signal.SIGBREAK, _raise_keyboard_interrupt)
+    
     gateway = AirguardGateway()
     gateway.run()
 
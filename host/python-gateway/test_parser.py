@@ -5,6 +5,8 @@ Test script to simulate ESP32 receiver output and verify gateway parsing
 
 import json
 
+from gateway_enhanced import AirguardGateway
+
 # Sample receiver output (fenced block format)
 SAMPLE_OUTPUT = """
 === Received Data ===
@@ -17,12 +19,17 @@ Temp: 28.10 °C
 ====================
 """
 
+
+def _parser() -> AirguardGateway:
+    """Gateway instance without the database/MQTT/HTTP setup done in __init__"""
+    return AirguardGateway.__new__(AirguardGateway)
+
+
 def test_parse():
     """Test the parsing logic"""
     print("Simulating ESP32 receiver output:\n")
     print(SAMPLE_OUTPUT)
     
-    # This would be parsed by gateway.py
     print("\nExpected JSON output:")
     expected = {
         "batchId": "5A17C2EF",
@@ -46,7 +53,39 @@ def test_parse():
     }
     
     print(json.dumps(expected, indent=2))
+    
+    parsed = _parser().parse_packet(SAMPLE_OUTPUT.strip().splitlines())
+    assert parsed is not None, "Sample packet was rejected"
+    parsed.pop('receivedTs')
+    assert parsed == expected, f"Parsed packet differs: {parsed}"
     print("\n✓ Test completed")
 
+
+def test_parse_missing_samples():
+    """A packet without the required Samples: field is rejected"""
+    lines = SAMPLE_OUTPUT.replace(" | Samples: 187", "").strip().splitlines()
+    assert _parser().parse_packet(lines) is None
+    print("✓ Incomplete packet rejected")
+
+
+
+def test_handle_line_fenced_block():
+    """Raw serial lines are collected between the fences and parsed once"""
+    gateway = _parser()
+    gateway._in_packet = False
+    gateway._packet_lines = []
+    packets = []
+    gateway.process_packet = packets.append
+    
+    for line in SAMPLE_OUTPUT.strip().splitlines():
+        gateway.handle_line(line.encode('utf-8'))
+    
+    assert len(packets) == 1
+    assert packets[0]['batchId'] == "5A17C2EF"
+    print("✓ Fenced block dispatched")
+
+
 if __name__ == '__main__':
     test_parse()
+    test_parse_missing_samples()
+    test_handle_line_fenced_block()
@@ -0,0 +1,45 @@
+# Shared helpers for the Airguard PowerShell scripts
+# Dot-source from a script: . (Join-Path $PSScriptRoot "service-helpers.ps1")
+
+# Connect timeout shared by every loopback probe
+$LocalPortTimeoutMs = 200
+
+# Begin a non-blocking connect to a loopback port; finish it with Complete-LocalPortProbe.
+# Starting several probes before completing any lets their timeouts overlap.
+function Start-LocalPortProbe([int]$Port) {
+    $client = New-Object System.Net.Sockets.TcpClient
+    return @{Port=$Port; Client=$client; Task=$client.ConnectAsync("127.0.0.1", $Port)}
+}
+
+# Wait for a started probe; $true if something is listening. Always closes the client.
+function Complete-LocalPortProbe($Probe, [int]$TimeoutMs = $LocalPortTimeoutMs) {
+    try {
+        return $Probe.Task.Wait($TimeoutMs) -and $Probe.Client.Connected
+    } catch {
+        return $false
+    } finally {
+        $Probe.Client.Close()
+    }
+}
+
+# Connect to a loopback port with a short timeout; $true if something is listening
+function Test-LocalPort([int]$Port, [int]$TimeoutMs = $LocalPortTimeoutMs) {
+    return Complete-LocalPortProbe (Start-LocalPortProbe $Port) $TimeoutMs
+}
+
+# Poll a port until it accepts connections: every 50 ms for the first
+# 500 ms, then every 100 ms up to the deadline. Returns on first success.
+function Wait-ForPort([int]$Port, [double]$DeadlineSeconds = 5.0) {
+    $clock = [System.Diagnostics.Stopwatch]::StartNew()
+    while ($clock.Elapsed.TotalSeconds -lt $DeadlineSeconds) {
+        if (Test-LocalPort $Port) {
+            return $true
+        }
+        if ($clock.ElapsedMilliseconds -lt 500) {
+            Start-Sleep -Milliseconds 50
+        } else {
+            Start-Sleep -Milliseconds 100
+        }
+    }
+    return $false
+}
@@ -1,59 +1,79 @@
 # Airguard Full Stack Startup Script
 # This script starts all services in the correct order
 
+# Resolve the project root once from the script location
+$ProjectRoot = $PSScriptRoot
+
+. (Join-Path $PSScriptRoot "service-helpers.ps1")
+
 Write-Host "Starting Airguard Full Stack..." -ForegroundColor Green
 Write-Host ""
 
 # Check MongoDB
 Write-Host "Checking MongoDB..." -ForegroundColor Yellow
-$mongoService = Get-Service MongoDB -ErrorAction SilentlyContinue
-if ($mongoService.Status -ne 'Running') {
-    Write-Host "Starting MongoDB..." -ForegroundColor Yellow
-    Start-Service MongoDB
+# Only query the service (and start it) when nothing is listening yet
+$mongoInstalled = $true
+if (-not (Test-LocalPort 27017)) {
+    $mongoService = Get-Service MongoDB -ErrorAction SilentlyContinue
+    if (-not $mongoService) {
+        $mongoInstalled = $false
+        Write-Host "[WARN] MongoDB service is not installed" -ForegroundColor Red
+    } elseif ($mongoService.Status -ne 'Running') {
+        Write-Host "Starting MongoDB..." -ForegroundColor Yellow
+        Start-Service MongoDB
+    }
+}
+# Nothing will come up on the port without the service, so skip the wait
+if ($mongoInstalled) {
+    if (Wait-ForPort 27017) {
+        Write-Host "[OK] MongoDB is running" -ForegroundColor Green
+    } else {
+        Write-Host "[WARN] MongoDB is not accepting connections on port 27017" -ForegroundColor Red
+    }
 }
-Write-Host "[OK] MongoDB is running" -ForegroundColor Green
 Write-Host ""
 
-# Start MQTT Broker
-Write-Host "Starting MQTT Broker..." -ForegroundColor Yellow
-Start-Process powershell -ArgumentList "-NoExit", "-Command", "cd C:\Users\Admin\esp32dongle\mqtt-broker; npm start"
-Start-Sleep -Seconds 3
-Write-Host "[OK] MQTT Broker started on port 1883" -ForegroundColor Green
-Write-Host ""
+# Launch the broker and backend together; each opens in its own window
+Write-Host "Starting MQTT Broker and Node.js Backend..." -ForegroundColor Yellow
+Start-Process powershell -WorkingDirectory (Join-Path $ProjectRoot "mqtt-broker") -ArgumentList "-NoExit", "-Command", "npm start"
+Start-Process powershell -WorkingDirectory (Join-Path $ProjectRoot "host\node-backend") -ArgumentList "-NoExit", "-Command", "npm start"
 
-# Start Node.js Backend
-Write-Host "Starting Node.js Backend..." -ForegroundColor Yellow
-Start-Process powershell -ArgumentList "-NoExit", "-Command", "cd C:\Users\Admin\esp32dongle\host\node-backend; npm start"
-Start-Sleep -Seconds 3
-Write-Host "[OK] Backend started (HTTP:8080, WS:8081)" -ForegroundColor Green
+# The bridge and gateway connect to MQTT at startup, so hold them until the broker listens
+if (Wait-ForPort 1883 15) {
+    Write-Host "[OK] MQTT Broker started on port 1883" -ForegroundColor Green
+} else {
+    Write-Host "[WARN] MQTT Broker not listening on port 1883 yet" -ForegroundColor Red
+}
 Write-Host ""
 
-# Start MQTT-MongoDB Bridge
-Write-Host "Starting MQTT-MongoDB Bridge..." -ForegroundColor Yellow
-Start-Process powershell -ArgumentList "-NoExit", "-Command", "cd C:\Users\Admin\esp32dongle\bridges\mqtt-mongo; node bridge.js"
-Start-Sleep -Seconds 2
+Write-Host "Starting MQTT-MongoDB Bridge and Python Gateway..." -ForegroundColor Yellow
+Start-Process powershell -WorkingDirectory (Join-Path $ProjectRoot "bridges\mqtt-mongo") -ArgumentList "-NoExit", "-Command", "node bridge.js"
+Start-Process powershell -WorkingDirectory (Join-Path $ProjectRoot "host\python-gateway") -ArgumentList "-NoExit", "-Command", "python gateway_enhanced.py"
 Write-Host "[OK] MQTT Bridge started" -ForegroundColor Green
+Write-Host "[OK] Python Gateway started (COM12)" -ForegroundColor Green
 Write-Host ""
 
-# Start Python Gateway
-Write-Host "Starting Python Gateway..." -ForegroundColor Yellow
-Start-Process powershell -ArgumentList "-NoExit", "-Command", "cd C:\Users\Admin\esp32dongle\host\python-gateway; python gateway_enhanced.py"
-Start-Sleep -Seconds 2
-Write-Host "[OK] Python Gateway started (COM12)" -ForegroundColor Green
+if ((Wait-ForPort 8080 15) -and (Wait-ForPort 8081 5)) {
+    Write-Host "[OK] Backend started (HTTP:8080, WS:8081)" -ForegroundColor Green
+} else {
+    Write-Host "[WARN] Backend not listening on ports 8080/8081 yet" -ForegroundColor Red
+}
 Write-Host ""
 
-Write-Host "========================================" -ForegroundColor Cyan
+# Write the summary as a few multi-line blocks (one per colour) rather than line by line
+$rule = "=" * 40
+Write-Host $rule -ForegroundColor Cyan
 Write-Host "ALL SERVICES RUNNING!" -ForegroundColor Green
-Write-Host "========================================" -ForegroundColor Cyan
-Write-Host ""
+Write-Host "$rule`n" -ForegroundColor Cyan
 Write-Host "Services:" -ForegroundColor Yellow
-Write-Host "  MongoDB:        mongodb://localhost:27017" -ForegroundColor White
-Write-Host "  MQTT Broker:    mqtt://localhost:1883" -ForegroundColor White
-Write-Host "  REST API:       http://localhost:8080/v1/samples" -ForegroundColor White
-Write-Host "  WebSocket:      ws://localhost:8081" -ForegroundColor White
-Write-Host "  Python Gateway: COM12 at 115200 baud" -ForegroundColor White
-Write-Host ""
+Write-Host @"
+  MongoDB:        mongodb://localhost:27017
+  MQTT Broker:    mqtt://localhost:1883
+  REST API:       http://localhost:8080/v1/samples
+  WebSocket:      ws://localhost:8081
+  Python Gateway: COM12 at 115200 baud
+
+"@ -ForegroundColor White
 Write-Host "Dashboard:" -ForegroundColor Yellow
-Write-Host "  Open: C:\Users\Admin\esp32dongle\host\dashboard.html" -ForegroundColor White
-Write-Host ""
+Write-Host "  Open: $(Join-Path $ProjectRoot 'host\dashboard.html')`n" -ForegroundColor White
 Write-Host "Press button on ESP32 sender to see data flow!" -ForegroundColor Green
@@ -6,12 +6,20 @@ Write-Host ""
 
 # Stop Node.js processes
 Write-Host "Stopping Node.js processes..." -ForegroundColor Yellow
-Get-Process -Name "node" -ErrorAction SilentlyContinue | Stop-Process -Force
-Write-Host "[OK] Node.js processes stopped" -ForegroundColor Green
+$nodeProcs = @(Get-Process -Name "node" -ErrorAction SilentlyContinue)
+$nodeProcs | Stop-Process -Force -ErrorAction SilentlyContinue
 
 # Stop Python processes
 Write-Host "Stopping Python processes..." -ForegroundColor Yellow
-Get-Process -Name "python" -ErrorAction SilentlyContinue | Where-Object { $_.CommandLine -like "*gateway*" } | Stop-Process -Force
+# Match name and command line in one WMI query instead of per-process in the pipeline
+# (Process.CommandLine does not exist on Windows PowerShell 5.1)
+$gatewayProcs = @(Get-CimInstance Win32_Process -Filter "(Name = 'python.exe' OR Name = 'python3.exe') AND CommandLine LIKE '%gateway%'" -ErrorAction SilentlyContinue |
+    ForEach-Object { Get-Process -Id $_.ProcessId -ErrorAction SilentlyContinue })
+$gatewayProcs | Stop-Process -Force -ErrorAction SilentlyContinue
+
+# Everything has been signalled; wait for the whole set to exit at once
+$nodeProcs + $gatewayProcs | Wait-Process -Timeout 3 -ErrorAction SilentlyContinue
+Write-Host "[OK] Node.js processes stopped" -ForegroundColor Green
 Write-Host "[OK] Python processes stopped" -ForegroundColor Green
 
 Write-Host ""